@@ -1,21 +1,202 @@
 # MathExprWeb/app.py
-from flask import Flask, render_template, request, jsonify, url_for, flash, redirect
+from flask import Flask, Response, abort, render_template, request, url_for, flash, redirect
+from flask.json.provider import DefaultJSONProvider
 from flask_login import login_user, current_user, logout_user, login_required
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache, partial
+from datetime import datetime
+from sqlalchemy import event
+import atexit
+import hashlib
+import orjson
 import os
+import queue
+import sys
+import threading
 
 from extensions import db, login_manager
 
+# Modes accepted by /api/solve, with the size of each mode's result cache.
+# Caches are per mode so a burst of cheap requests cannot evict expensive results.
+SOLVER_CACHE_SIZES = {
+    'expand': 2048, 'simplify': 1024, 'factor': 1024, 'substitute': 2048,
+    'differentiate': 1024, 'resimplify': 1024, 'integrate': 512,
+    'laplace_t': 128, 'fourier_t': 64, 'mellin_t': 64,
+}
+VALID_MODES = frozenset(map(sys.intern, SOLVER_CACHE_SIZES))
+# Longest expression handed to the SymPy parser
+MAX_EXPR_LEN = 4096
+# Wall-clock limit for one solver call (integrate_expr applies its own, shorter limit)
+SOLVE_TIMEOUT = 30  # seconds
+
+# History rows are buffered and written in one transaction per batch.
+HISTORY_BATCH_SIZE = 500
+HISTORY_FLUSH_INTERVAL = 1.0  # seconds
+
+# GET /api/history pagination
+HISTORY_PAGE_SIZE = 100
+HISTORY_MAX_PAGE_SIZE = 1000
+
+def ojsonify(obj, status=200):
+    """jsonify() counterpart backed by orjson; datetimes are encoded natively as UTC."""
+    return Response(orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC | orjson.OPT_OMIT_MICROSECONDS),
+                    status=status, mimetype='application/json')
+
+# --- Solver process pool ---
+# SymPy runs in worker processes so a pathological expression cannot hold a
+# request thread (or its memory) indefinitely. Set MATH_SOLVER_POOL=0 to solve
+# inline instead, which is also the fallback where no pool can be started.
+SOLVER_PROCESS_POOL = os.environ.get('MATH_SOLVER_POOL', '1') != '0'
+
+_executor = None
+_executor_lock = threading.Lock()
+_executor_disabled = not SOLVER_PROCESS_POOL
+
+def get_executor():
+    """Returns the solver pool, or None when solvers run inline in the request thread."""
+    global _executor, _executor_disabled
+    with _executor_lock:
+        if _executor is None and not _executor_disabled:
+            try:
+                _executor = ProcessPoolExecutor(max_workers=os.cpu_count())
+            except (OSError, NotImplementedError, ImportError):
+                # No working multiprocessing here (e.g. serverless runtimes without /dev/shm)
+                _executor_disabled = True
+        return _executor
+
+def disable_executor(executor):
+    """Switches to inline solving after executor failed to start its worker processes."""
+    global _executor, _executor_disabled
+    with _executor_lock:
+        _executor_disabled = True
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def reset_executor(executor):
+    """
+    Kills executor's workers if it is still the current pool; the next request starts
+    a fresh pool. A pool that was already replaced is left alone, so a late failure
+    from an old pool cannot take down the healthy pool other requests are using.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not executor:
+            return
+        _executor = None
+    # _processes is None once the pool has been shut down
+    for process in list((executor._processes or {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+def submit_solver(solver, expr):
+    """
+    Submits solver(expr) to the pool and returns (executor, future), or (None, None)
+    when solvers run inline. A pool another request shut down between get_executor()
+    and submit() is retried once on its replacement.
+    """
+    for _ in range(2):
+        executor = get_executor()
+        if executor is None:
+            return None, None
+        try:
+            return executor, executor.submit(solver, expr)
+        except BrokenProcessPool:
+            # submit() itself raises BrokenProcessPool once a worker has died
+            reset_executor(executor)
+            raise
+        except RuntimeError:
+            # "cannot schedule new futures after shutdown": retry on a fresh pool
+            reset_executor(executor)
+        except OSError:
+            # The worker processes could not be started
+            disable_executor(executor)
+            return None, None
+    raise BrokenProcessPool("solver pool was shut down")
+
+def run_solver(solver, expr):
+    """
+    Runs solver(expr) in the pool; raises TimeoutError after SOLVE_TIMEOUT seconds
+    and BrokenProcessPool if the pool died, or was reset by another request, while
+    the call was queued or running. Without a pool the call runs inline, untimed.
+    """
+    executor, future = submit_solver(solver, expr)
+    if future is None:
+        return solver(expr)
+    try:
+        return future.result(timeout=SOLVE_TIMEOUT)
+    except TimeoutError:
+        # A running SymPy call cannot be interrupted, only its process killed
+        if not future.cancel():
+            reset_executor(executor)
+        raise
+    except BrokenProcessPool:
+        reset_executor(executor)
+        raise
+    except CancelledError:
+        # Another request's timeout reset the pool while this call was still queued
+        raise BrokenProcessPool("queued solver call was cancelled") from None
+
+class UncachedResult(Exception):
+    """Carries a solver's (display, latex, error) tuple past the result cache."""
+
+    def __init__(self, result):
+        super().__init__(result[2])
+        self.result = result
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider that parses and serializes with orjson."""
+
+    def dumps(self, obj, **kwargs):
+        if not kwargs:
+            try:
+                return orjson.dumps(obj, option=orjson.OPT_NAIVE_UTC).decode()
+            except TypeError:
+                pass
+        # orjson has no indent/sort_keys/custom default hooks; let Flask handle those
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 def create_app():
     app = Flask(__name__, static_folder='static', template_folder='templates')
+    app.json = OrjsonProvider(app)
 
     # --- Configuration for Local Development ---
     app.config['SECRET_KEY'] = 'a_very_secret_key_change_this_for_production' 
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///mathexpr.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Reject oversized request bodies before they are read or parsed
+    app.config['MAX_CONTENT_LENGTH'] = 64 * 1024
+    # Keep SQLite connections open and shared across request/writer threads
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_pre_ping': False,
+        'connect_args': {'check_same_thread': False, 'timeout': 30},
+    }
+    # Insert each History row during the request. Set to True on a long-running server
+    # to buffer rows for a background writer thread instead; serverless hosts (Vercel)
+    # freeze or recycle such threads, so buffered rows could be lost there.
+    app.config['HISTORY_DEFERRED_WRITES'] = False
 
     # Initialize extensions with the app
     db.init_app(app)
     login_manager.init_app(app)
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL + NORMAL sync makes each history flush a cheap append;
+            # in-memory temp tables and mmap'd reads speed up history scans
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.execute('PRAGMA temp_store=MEMORY')
+            cursor.execute('PRAGMA mmap_size=268435456')
+            cursor.close()
     
     login_manager.login_view = 'login'
     login_manager.login_message_category = 'danger'
@@ -23,17 +204,115 @@ def create_app():
     from models import User, History
     from forms import RegistrationForm, LoginForm
 
+    # --- Deferred History writes ---
+    history_queue = queue.Queue()
+    history_lock = threading.Lock()
+    flush_requested = threading.Event()
+
+    def flush_history():
+        """Write every buffered History row, HISTORY_BATCH_SIZE rows per transaction."""
+        with history_lock:
+            while True:
+                rows = []
+                while len(rows) < HISTORY_BATCH_SIZE:
+                    try:
+                        rows.append(history_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if not rows:
+                    return
+                with app.app_context():
+                    with db.session.begin():
+                        db.session.execute(History.__table__.insert(), rows)
+
+    def history_writer():
+        while True:
+            flush_requested.wait(HISTORY_FLUSH_INTERVAL)
+            flush_requested.clear()
+            try:
+                flush_history()
+            except Exception:
+                app.logger.exception('Failed to write history batch')
+
+    # The writer is started by the first deferred write in each process: a thread
+    # started at import time would not survive a pre-fork server (gunicorn --preload)
+    writer_pid = None
+    writer_start_lock = threading.Lock()
+
+    def ensure_history_writer():
+        nonlocal writer_pid
+        if writer_pid == os.getpid():
+            return
+        with writer_start_lock:
+            if writer_pid != os.getpid():
+                threading.Thread(target=history_writer, name='history-writer', daemon=True).start()
+                writer_pid = os.getpid()
+
+    atexit.register(flush_history)
+
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    from solver_utils import (
-        expand_expr, simplify_expr, factor_expr, substitute_expr,
-        integrate_expr, resimplify_expr,
-        laplace_transform_expr, fourier_transform_expr, mellin_transform_expr,
-        differentiate_expr, get_latex_from_expr
-    )
-    
+        # Flask-Login keeps the result on g, so this runs at most once per request;
+        # Session.get() answers from the identity map when the row is already loaded.
+        return db.session.get(User, int(user_id))
+
+    def solvers():
+        # solver_utils pulls in SymPy (hundreds of ms), so it is only imported
+        # by the first request that needs it; later calls hit sys.modules.
+        import solver_utils
+        return solver_utils
+
+    # Solvers are pure functions of their input string, so identical requests
+    # can be answered from memory instead of re-running SymPy.
+    cached_solvers = {}
+
+    def get_cached_solver(mode):
+        solver = cached_solvers.get(mode)
+        if solver is None:
+            utils = solvers()
+            # Large results are compressed in the worker before being pickled back
+            solve = partial(utils.run_packed, utils.DISPATCH[mode])
+
+            # Only successful results are cached: lru_cache never stores a call that
+            # raises, and error tuples include integrate_expr's own timeout, which may
+            # only reflect a moment of heavy load. SOLVE_TIMEOUT propagates as well.
+            @lru_cache(maxsize=SOLVER_CACHE_SIZES[mode])
+            def cached_solve(expr):
+                result = utils.unpack_result(run_solver(solve, expr))
+                if result[2]:
+                    raise UncachedResult(result)
+                return result
+
+            def solver(expr):
+                try:
+                    return cached_solve(expr)
+                except UncachedResult as e:
+                    return e.result
+
+            solver.cache_info = cached_solve.cache_info
+            cached_solvers[mode] = solver
+        return solver
+
+    def get_json_object():
+        """The request's JSON body as a dict, or None if it is not a JSON object."""
+        data = request.get_json(cache=False) or {}
+        return data if isinstance(data, dict) else None
+
+    def invalid_body_response():
+        return ojsonify({'ok': False, 'error': "❌ Error: Request body must be a JSON object."}, 400)
+
+    def invalid_expr_response(expr):
+        """Returns an error response for a payload that must not reach SymPy, else None."""
+        if not isinstance(expr, str):
+            return ojsonify({'ok': False, 'error': "❌ Error: Expression must be a string."}, 400)
+        if len(expr) > MAX_EXPR_LEN:
+            return ojsonify({'ok': False, 'error': f"❌ Error: Expression is too long (max {MAX_EXPR_LEN} characters)."}, 413)
+        return None
+
+    @app.errorhandler(413)
+    def request_too_large(e):
+        return ojsonify({'ok': False, 'error': "❌ Error: Request body is too large."}, 413)
+
     # --- Register Routes within the app context ---
     @app.route('/')
     def index():
@@ -61,6 +340,7 @@ def create_app():
         if form.validate_on_submit():
             user = User.query.filter_by(username=form.username.data).first()
             if user and user.check_password(form.password.data):
+                db.session.commit()  # persists a password hash upgraded during the check
                 login_user(user)
                 next_page = request.args.get('next')
                 return redirect(next_page) if next_page else redirect(url_for('index'))
@@ -75,60 +355,108 @@ def create_app():
     
     @app.route('/api/render_latex', methods=['POST']) # NEW ROUTE FOR LIVE PREVIEW
     def api_render_latex():
-        data = request.get_json() or {}
+        data = get_json_object()
+        if data is None:
+            return invalid_body_response()
         expr = data.get('expr', '')
+        invalid = invalid_expr_response(expr)
+        if invalid:
+            return invalid
 
         if not expr.strip():
-            return jsonify({'ok': True, 'latex': ''})
+            return ojsonify({'ok': True, 'latex': ''})
 
-        latex, err = get_latex_from_expr(expr)
+        latex, err = solvers().get_latex_from_expr(expr)
         
         if err:
             # Return parsing errors directly for feedback in the live preview
-            return jsonify({'ok': False, 'error': err}) 
+            return ojsonify({'ok': False, 'error': err})
 
-        return jsonify({'ok': True, 'latex': latex})
+        return ojsonify({'ok': True, 'latex': latex})
 
     @app.route('/api/solve', methods=['POST'])
     def api_solve():
-        data = request.get_json() or {}
-        mode = (data.get('mode') or '').lower().strip()
+        data = get_json_object()
+        if data is None:
+            return invalid_body_response()
+        mode = data.get('mode', '')
+        if not isinstance(mode, str):
+            return ojsonify({'ok': False, 'error': "❌ Error: Mode must be a string."}, 400)
+        mode = mode.strip().lower()
+        if mode not in VALID_MODES:
+            return ojsonify({'ok': False, 'error': f"Unknown mode '{mode}'"}, 400)
+
         expr = data.get('expr', '')
-        result_tuple = None
-
-        if mode == 'expand': result_tuple = expand_expr(expr)
-        elif mode == 'simplify': result_tuple = simplify_expr(expr)
-        elif mode == 'factor': result_tuple = factor_expr(expr)
-        elif mode == 'substitute': result_tuple = substitute_expr(expr)
-        elif mode == 'integrate': result_tuple = integrate_expr(expr)
-        elif mode == 'differentiate': result_tuple = differentiate_expr(expr)
-        elif mode == 'resimplify': result_tuple = resimplify_expr(expr)
-        elif mode == 'laplace_t': result_tuple = laplace_transform_expr(expr)
-        elif mode == 'fourier_t': result_tuple = fourier_transform_expr(expr)
-        elif mode == 'mellin_t': result_tuple = mellin_transform_expr(expr)
-        else: return jsonify({'ok': False, 'error': f"Unknown mode '{mode}'"}), 400
-
-        display, latex, err = result_tuple
-        if err: return jsonify({'ok': False, 'error': err}), 400
+        invalid = invalid_expr_response(expr)
+        if invalid:
+            return invalid
+
+        normalized = expr.strip()
+        # Results are deterministic per (mode, expression): a client that already
+        # holds this answer gets a 304 without any solver work.
+        etag = hashlib.sha1(f"{mode}|{normalized}".encode()).hexdigest()
+        if request.if_none_match.contains(etag):
+            not_modified = Response(status=304)
+            not_modified.set_etag(etag)
+            return not_modified
+
+        try:
+            display, latex, err = get_cached_solver(mode)(normalized)
+        except TimeoutError:
+            return ojsonify({'ok': False, 'error': f"❌ Error: Operation timed out after {SOLVE_TIMEOUT} seconds."}, 408)
+        except BrokenProcessPool:
+            # Another request's timeout killed the pool while this one was running
+            return ojsonify({'ok': False, 'error': "❌ Error: Solver was interrupted, please try again."}, 503)
+        if err: return ojsonify({'ok': False, 'error': err}, 400)
 
         if current_user.is_authenticated:
-            new_history = History(mode=mode, expression=expr, result=display, latex=latex, user_id=current_user.id)
-            db.session.add(new_history)
-            db.session.commit()
+            row = {'mode': mode, 'expression': expr, 'result': display, 'latex': latex,
+                   'user_id': current_user.id, 'timestamp': datetime.utcnow()}
+            if app.config['HISTORY_DEFERRED_WRITES']:
+                ensure_history_writer()
+                history_queue.put(row)
+                if history_queue.qsize() >= HISTORY_BATCH_SIZE:
+                    flush_requested.set()
+            else:
+                # Core INSERT: skips the ORM unit-of-work flush for a single row
+                db.session.execute(History.__table__.insert(), row)
+                db.session.commit()
+
+        response = ojsonify({'ok': True, 'result': display, 'latex': latex})
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, max-age=60'
+        return response
 
-        return jsonify({'ok': True, 'result': display, 'latex': latex})
+    @app.route('/api/cache_info')
+    def api_cache_info():
+        # Hit/miss counters for tuning SOLVER_CACHE_SIZES; only exposed in debug mode
+        if not app.debug:
+            abort(404)
+        return ojsonify({mode: solver.cache_info()._asdict() for mode, solver in cached_solvers.items()})
 
     @app.route('/api/history', methods=['GET', 'DELETE'])
     @login_required
     def manage_history():
+        # Make sure rows still sitting in the buffer are visible to this request
+        flush_history()
         if request.method == 'GET':
-            user_history = History.query.filter_by(user_id=current_user.id).order_by(History.timestamp.desc()).all()
-            history_list = [{'mode': h.mode, 'expression': h.expression, 'result': h.result, 'latex': h.latex, 'timestamp': h.timestamp.strftime('%Y-%m-%d %H:%M:%S')} for h in user_history]
-            return jsonify(history_list)
+            limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 0), HISTORY_MAX_PAGE_SIZE)
+            offset = max(request.args.get('offset', 0, type=int), 0)
+            # Select only the returned columns; rows come back as plain tuples, not ORM objects
+            rows = db.session.execute(
+                db.select(History.mode, History.expression, History.result, History.latex, History.timestamp)
+                .where(History.user_id == current_user.id)
+                .order_by(History.timestamp.desc())
+                .limit(limit).offset(offset)
+            )
+            history_list = [{'mode': mode, 'expression': expression, 'result': result, 'latex': latex, 'timestamp': timestamp}
+                            for mode, expression, result, latex, timestamp in rows]
+            return ojsonify(history_list)
         if request.method == 'DELETE':
-            History.query.filter_by(user_id=current_user.id).delete()
+            # One Core DELETE statement; no ORM session synchronization
+            db.session.execute(History.__table__.delete().where(History.user_id == current_user.id))
             db.session.commit()
-            return jsonify({'ok': True, 'message': 'History cleared'})
+            return ojsonify({'ok': True, 'message': 'History cleared'})
             
     return app
 
@@ -138,6 +466,10 @@ app = create_app()
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        # create_all() skips existing tables, so add any newer indexes to old databases
+        from models import History
+        for index in History.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
 
@@ -2,7 +2,12 @@
 from flask_login import UserMixin
 # MODIFIED: Import db from the new extensions.py file
 from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+
+# Argon2id with the OWASP baseline parameters (19 MiB, 2 iterations, 1 lane)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
 
 
 class User(UserMixin, db.Model):
@@ -15,10 +20,24 @@ class User(UserMixin, db.Model):
     histories = db.relationship('History', backref='user', lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        # Accounts created before argon2 still carry a werkzeug hash: verify it once
+        # and upgrade in place (the caller commits the session).
+        if not self.password_hash.startswith('$argon2'):
+            if not check_password_hash(self.password_hash, password):
+                return False
+            self.set_password(password)
+            return True
+
+        try:
+            password_hasher.verify(self.password_hash, password)
+        except (VerificationError, InvalidHashError):
+            return False
+        if password_hasher.check_needs_rehash(self.password_hash):
+            self.set_password(password)
+        return True
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -36,5 +55,10 @@ class History(db.Model):
 
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
 
+    # Serves the per-user, newest-first history listing straight from the index
+    __table_args__ = (
+        db.Index('ix_histories_user_ts', user_id, timestamp.desc()),
+    )
+
     def __repr__(self):
         return f'<History {self.expression}>'
\ No newline at end of file
@@ -1,21 +1,35 @@
 # solver_utils.py
 # Full parsing / transformation logic + integrate support + trig-aware expand/factor/simplify and resimplify.
 
+import builtins
+import math
 import re
-import traceback
-from multiprocessing import Process, Queue
+from functools import lru_cache
+import multiprocessing
+import os
+import signal
+import threading
+import types
+import zlib
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from sympy import (
     expand, S, simplify, factor, sympify, symbols, Symbol, latex as sympy_latex,
-    integrate as sympy_integrate, Integral as SympyIntegral,
+    integrate as sympy_integrate,
     sin, cos, tan, cot, sec, csc,
     asin, acos, atan, acot, asec, acsc,
     sinh, cosh, tanh,
     exp, log, sqrt, Abs, pi, E, trigsimp,
-    apart,
+    apart, together, factor_terms,
     diff as sympy_diff, # ADDED: for differentiation
-    idiff, # NEW: for implicit differentiation
-    Function, Derivative # New for general chain rule
+    Function, Derivative, # New for general chain rule
+    lambdify, Float, Integer, Max, Min, Poly, Basic
 )
+from sympy.core.numbers import ImaginaryUnit, NumberSymbol
+from sympy.functions.elementary.trigonometric import TrigonometricFunction
+from sympy.functions.elementary.hyperbolic import HyperbolicFunction
+from sympy.printing.latex import LatexPrinter
+from sympy.printing.str import StrPrinter
 from sympy.parsing.sympy_parser import (
     parse_expr, standard_transformations,
     implicit_multiplication_application, convert_xor
@@ -26,6 +40,12 @@ from sympy.integrals.transforms import (
     laplace_transform, fourier_transform, mellin_transform
 )
 
+# numba is optional: without it the lambdified functions run as plain Python
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
 # --- Unicode superscript conversion maps ---
 unicode_sup_map = str.maketrans("⁰¹²³⁴⁵⁶⁷⁸⁹⁻", "0123456789-")
 superscript_map = {
@@ -33,85 +53,171 @@ superscript_map = {
     '5': '⁵', '6': '⁶', '7': '⁷', '8': '⁸', '9': '⁹',
     '-': '⁻'
 }
+superscript_table = str.maketrans(superscript_map)
+
+# --- Precompiled patterns for the string pre/post-processing helpers ---
+_UNICODE_POW_RE = re.compile(r'([a-zA-Z0-9)])([⁰¹²³⁴⁵⁶⁷⁸⁹⁻]+)')
+_PAREN_POW_RE = re.compile(r'\*\*\((.*?)\)')
+_NUM_POW_RE = re.compile(r'\*\*([a-zA-Z0-9\.\-]+)')
+_NUMBER_LITERAL_RE = re.compile(r'-?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?', re.ASCII)
+_INTEGER_LITERAL_RE = re.compile(r'-?\d+', re.ASCII)
+_UNARY_ABS_RE = re.compile(r'(?<=[=\s\(\+\-\*/,])-\s*Abs\(')
+_TRAILING_C_RE = re.compile(r'\s*\+\s*C\s*$', re.IGNORECASE)
+
+# The parser's whitelist of names; also the source of the function-name set below
+_ALLOWED_LOCALS = {
+    'sin': sin, 'cos': cos, 'tan': tan, 'cot': cot, 'sec': sec, 'csc': csc,
+    'asin': asin, 'acos': acos, 'atan': atan, 'acot': acot, 'asec': asec, 'acsc': acsc,
+    'arcsin': asin, 'arccos': acos, 'arctan': atan, 'arccot': acot, 'arcsec': asec, 'arccsc': acsc,
+    'sinh': sinh, 'cosh': cosh, 'tanh': tanh,
+    'exp': exp, 'log': log, 'sqrt': sqrt, 'Abs': Abs, 'abs': Abs,
+    'pi': pi, 'E': E, 'inf': S.Infinity, 'oo': S.Infinity
+}
+# Function names protected from implicit multiplication when used as calls, e.g. sin(x)
+_FUNC_NAMES = frozenset(name for name, obj in _ALLOWED_LOCALS.items() if callable(obj)) | {'erf', 'erfc'}
+# Function names that take an explicit '*' after a numeric coefficient, e.g. 2 sin x
+_COEF_FUNC_NAMES = frozenset([
+    'sin','cos','tan','cot','sec','csc','asin','acos','atan','acot','asec','acsc',
+    'sinh','cosh','tanh','exp','log','sqrt','Abs','abs'
+])
+# Trig / hyperbolic function classes, for has() checks before trig-specific passes
+_TRIG_FUNCS = (sin, cos, tan, cot, sec, csc)
+_TRIG_HYPERBOLIC_FUNCS = _TRIG_FUNCS + (sinh, cosh, tanh)
+# Every function class that implements expand(trig=True) derives from one of these
+_TRIG_EXPANDABLE = (TrigonometricFunction, HyperbolicFunction)
+_ASCII_LETTERS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ')
+_ASCII_ALNUM = _ASCII_LETTERS | frozenset('0123456789')
 
 def unicode_to_normal_expr(expr):
     """
     Replace occurrences like x² or 2⁻³ to x**2 or 2**-3
     """
+    if expr.isascii():
+        # No superscripts possible (an O(1) flag check on CPython strings)
+        return expr
     def replace(match):
         base = match.group(1)
         supers = match.group(2).translate(unicode_sup_map)
         return f"{base}^{supers}"
-    return re.sub(r'([a-zA-Z0-9)])([⁰¹²³⁴⁵⁶⁷⁸⁹⁻]+)', replace, expr)
+    return _UNICODE_POW_RE.sub(replace, expr)
 
+def _numeric_power_to_unicode(match):
+    power = match.group(1)
+    # Only convert if it's a simple integer
+    if power.isdigit() or (power.startswith('-') and power[1:].isdigit()):
+        return power.translate(superscript_table)
+    # Otherwise, fall back to using a caret
+    return f"^{power}"
+
+@lru_cache(maxsize=1024)
 def normal_to_unicode_expr(expr):
     """
     Convert '**n' to unicode superscript or '^' and remove '*' for nicer output.
     [IMPROVED VERSION]
     """
-    # First, handle parenthesized exponents like **(n+1) -> ^(n+1)
-    expr = re.sub(r'\*\*\((.*?)\)', r'^(\1)', expr)
+    if '*' not in expr:
+        return expr
 
-    # Then, handle simple numeric exponents like **2 -> ² or **-1 -> ⁻¹
-    def numeric_power_to_unicode(match):
-        power = match.group(1)
-        # Only convert if it's a simple integer
-        if power.isdigit() or (power.startswith('-') and power[1:].isdigit()):
-            return ''.join(superscript_map.get(ch, ch) for ch in power)
-        # Otherwise, fall back to using a caret
-        return f"^{power}"
+    if '**' in expr:
+        # First, handle parenthesized exponents like **(n+1) -> ^(n+1)
+        expr = _PAREN_POW_RE.sub(r'^(\1)', expr)
 
-    expr = re.sub(r'\*\*([a-zA-Z0-9\.\-]+)', numeric_power_to_unicode, expr)
+        # Then, handle simple numeric exponents like **2 -> ² or **-1 -> ⁻¹
+        expr = _NUM_POW_RE.sub(_numeric_power_to_unicode, expr)
     expr = expr.replace('*', '')  # Remove multiplication signs for display
     return expr
 
 def insert_implicit_multiplication_rules(expr_str):
     """
     Safer insertion of explicit multiplication for parse reliability.
-    [FINAL VERSION]
+    Single left-to-right pass: known function calls are kept intact and a '*' is
+    inserted between adjacent number/name, ')'/name and name/'(' pairs.
     """
-    # FIX 1: Handle unary minus, e.g., -abs() -> -1*abs()
-    expr_str = re.sub(r'(?<=[=\s\(\+\-\*/])-\s*(abs|Abs)\(', r'-1*\1(', expr_str)
-    
-    # FIX 2: Handle coefficients, e.g., 2abs() -> 2*abs() or -2abs() -> -2*abs()
-    # This looks for a number followed by a function name and inserts a '*'
-    func_pattern = r'\b(sin|cos|tan|cot|sec|csc|asin|acos|atan|acot|asec|acsc|sinh|cosh|tanh|exp|log|sqrt|Abs|abs)\b'
-    expr_str = re.sub(rf'(\d+\.?\d*)\s*({func_pattern})', r'\1*\2', expr_str)
-
-    # --- Original rules for other cases ---
-    func_names = [
-        'sin','cos','tan','cot','sec','csc','asin','acos','atan','acot','asec','acsc',
-        'arcsin', 'arccos', 'arctan', 'arccot', 'arcsec', 'arccsc','sinh','cosh','tanh',
-        'exp','log','sqrt','Abs','erf','erfc'
-    ]
-    # Protect function names before applying general rules
-    placeholder_map = {}
-    for i, name in enumerate(func_names):
-        token = f"__FN{i}__"
-        placeholder_map[token] = name
-        expr_str = re.sub(rf'\b{name}\s*\(', f'{token}(', expr_str)
-
-    # General implicit multiplication rules
-    expr_str = re.sub(r'(\d)([a-zA-Z(])', r'\1*\2', expr_str)
-    expr_str = re.sub(r'(\))([a-zA-Z0-9(])', r'\1*\2', expr_str)
-    expr_str = re.sub(r'([a-zA-Z0-9])(\()', r'\1*\2', expr_str)
-
-    # Restore function names
-    for token, name in placeholder_map.items():
-        expr_str = expr_str.replace(token + '(', name + '(')
-        
-    return expr_str
-
+    out = []
+    prev = ''  # previous source character (inserted '*' count as '*')
+    i, n = 0, len(expr_str)
+    while i < n:
+        c = expr_str[i]
+
+        # Start of a name: check for function calls and numeric coefficients
+        if c in _ASCII_LETTERS and not (prev.isalpha() or prev == '_' or (prev.isalnum() and not prev.isdecimal())):
+            j = i + 1
+            while j < n and (expr_str[j].isalnum() or expr_str[j] == '_'):
+                j += 1
+            word = expr_str[i:j]
+            k = j
+            while k < n and expr_str[k].isspace():
+                k += 1
+
+            # FIX 2: Handle coefficients, e.g., 2 sin x -> 2*sin x or -2abs() -> -2*abs()
+            if word in _COEF_FUNC_NAMES and _ends_with_number(out):
+                while out[-1].isspace():
+                    out.pop()
+                out.append('*')
+                prev = '*'
+
+            if word in _FUNC_NAMES and k < n and expr_str[k] == '(':
+                if prev.isdecimal():
+                    out.append('*')
+                out.append(word + '(')
+                prev = '('
+                i = k + 1
+                continue
+
+        # General implicit multiplication rules
+        if ((prev.isdecimal() and (c in _ASCII_LETTERS or c == '('))
+                or (prev == ')' and (c in _ASCII_ALNUM or c == '('))
+                or (prev in _ASCII_ALNUM and prev and c == '(')):
+            out.append('*')
+        out.append(c)
+        prev = c
+        i += 1
+
+    return ''.join(out)
+
+def _ends_with_number(out):
+    """True if the emitted pieces end in a number, ignoring trailing whitespace."""
+    k = len(out) - 1
+    while k >= 0 and out[k].isspace():
+        k -= 1
+    if k < 0:
+        return False
+    if out[k] == '.':
+        k -= 1
+    return k >= 0 and out[k][-1].isdecimal()
+
+
+# --- Parser namespaces, built once ---
+# parse_expr evals the input with these as its namespaces, so an assignment
+# expression such as "(pi:=5)" writes into them: every parse gets its own copy.
+# (_ALLOWED_LOCALS is defined next to the function-name sets above)
+_TRANSFORMATIONS = standard_transformations + (implicit_multiplication_application, convert_xor)
+
+# The same global namespace parse_expr would otherwise rebuild (via 'from sympy import *') on
+# every call; copying it is ~6 us against ~1 ms for the rebuild
+_PARSE_GLOBALS = {}
+exec('from sympy import *', _PARSE_GLOBALS)
+_PARSE_GLOBALS.update(
+    (name, obj) for name, obj in vars(builtins).items() if isinstance(obj, types.BuiltinFunctionType)
+)
+_PARSE_GLOBALS['max'] = Max
+_PARSE_GLOBALS['min'] = Min
 
-def _parse_expression_string(expression_string):
+def _parse_expression_string(expression_string, evaluate=True):
     """
     Parses and normalizes a user-supplied expression string into a SymPy expression.
-    [FINAL, MORE ROBUST VERSION]
+    evaluate=False keeps the input's structure (used by the LaTeX preview); the CAS
+    operations want the canonical, evaluated form.
+    Returns (parsed_expr, None) or (None, error_message).
     """
-    expr_str = expression_string.strip()
-    if not expr_str:
-        return None, "❌ Error: Expression cannot be empty."
+    return _parse_cached(expression_string.strip(), evaluate)
 
+@lru_cache(maxsize=1024)
+def _preprocess(expr_str):
+    """
+    Rewrites user input into parse_expr syntax. Cached on its own so the preview
+    (evaluate=False) and the CAS operations (evaluate=True) share the work.
+    """
     expr_processed = unicode_to_normal_expr(expr_str)
     expr_processed = expr_processed.replace('^', '**')
 
@@ -121,30 +227,57 @@ def _parse_expression_string(expression_string):
     
     # 2. Find any unary minus right before Abs() and make multiplication explicit.
     #    This changes patterns like '(-Abs(' or '-Abs(' into '(-1*Abs(' or '-1*Abs('.
-    expr_processed = re.sub(r'(?<=[=\s\(\+\-\*/,])-\s*Abs\(', '-1*Abs(', expr_processed)
+    expr_processed = _UNARY_ABS_RE.sub('-1*Abs(', expr_processed)
     # --- END: New pre-processing ---
 
     # The general implicit multiplication is still useful for other cases.
-    expr_processed = insert_implicit_multiplication_rules(expr_processed)
+    return insert_implicit_multiplication_rules(expr_processed)
 
-    allowed_locals = {
-        'sin': sin, 'cos': cos, 'tan': tan, 'cot': cot, 'sec': sec, 'csc': csc,
-        'asin': asin, 'acos': acos, 'atan': atan, 'acot': acot, 'asec': asec, 'acsc': acsc,
-        'arcsin': asin, 'arccos': acos, 'arctan': atan, 'arccot': acot, 'arcsec': asec, 'arccsc': acsc,
-        'sinh': sinh, 'cosh': cosh, 'tanh': tanh,
-        'exp': exp, 'log': log, 'sqrt': sqrt, 'Abs': Abs, 'abs': Abs,
-        'pi': pi, 'E': E, 'inf': S.Infinity, 'oo': S.Infinity
-    }
+@lru_cache(maxsize=2048)
+def _parse_cached(expr_str, evaluate=True):
+    """
+    Memoized parser body: the same input is parsed once, then served from the cache
+    (SymPy expressions are immutable, so sharing them between callers is safe).
+    [FINAL, MORE ROBUST VERSION]
+    """
+    if not expr_str:
+        return None, "❌ Error: Expression cannot be empty."
+
+    expr_processed = _preprocess(expr_str)
 
     try:
-        transformations = standard_transformations + (implicit_multiplication_application, convert_xor)
-        parsed_expr = parse_expr(expr_processed, transformations=transformations, local_dict=allowed_locals, evaluate=False)
+        parsed_expr = parse_expr(
+            expr_processed, transformations=_TRANSFORMATIONS,
+            local_dict=dict(_ALLOWED_LOCALS), global_dict=dict(_PARSE_GLOBALS), evaluate=evaluate
+        )
         return parsed_expr, None
     except Exception as e:
         return None, f"❌ Error parsing expression: {e}"
 
 # --- Helper for Formatting Output ---
 
+class _SharedTermOrder:
+    """
+    Printer mixin: sorting the terms of every Add is the most expensive part of
+    printing, so a str and a LaTeX printer sharing one term_orders dict only do it once.
+    """
+    def __init__(self, term_orders, settings=None):
+        super().__init__(settings)
+        self.term_orders = term_orders
+
+    def _as_ordered_terms(self, expr, order=None):
+        key = (expr, order or self.order)
+        terms = self.term_orders.get(key)
+        if terms is None:
+            terms = self.term_orders[key] = super()._as_ordered_terms(expr, order)
+        return terms
+
+class _DisplayStrPrinter(_SharedTermOrder, StrPrinter):
+    pass
+
+class _DisplayLatexPrinter(_SharedTermOrder, LatexPrinter):
+    pass
+
 def _format_output(sympy_result):
     """Converts a SymPy object into both display and LaTeX strings."""
     # SymPy transform results can be tuples (result, convergence_conditions)
@@ -156,13 +289,16 @@ def _format_output(sympy_result):
         result_expr = sympy_result
         display_conditions = ""
 
-    display = normal_to_unicode_expr(str(result_expr))
+    # Both printers walk the same tree; let them share the sorted Add terms
+    term_orders = {}
+    result_str = _DisplayStrPrinter(term_orders).doprint(result_expr)
+    display = normal_to_unicode_expr(result_str)
     
     try:
-        latex = sympy_latex(result_expr)
+        latex = _DisplayLatexPrinter(term_orders).doprint(result_expr)
     except Exception:
         # Fallback to string representation if latex conversion fails
-        latex = str(result_expr)
+        latex = result_str
         
     return display + display_conditions, latex, None
 
@@ -187,8 +323,8 @@ def get_latex_from_expr(expression_string):
         lhs_str = eq_parts[0]
         rhs_str = eq_parts[1] if len(eq_parts) > 1 else '0' # Default RHS to 0 if empty
         
-        lhs_parsed, err_lhs = _parse_expression_string(lhs_str)
-        rhs_parsed, err_rhs = _parse_expression_string(rhs_str)
+        lhs_parsed, err_lhs = _parse_expression_string(lhs_str, evaluate=False)
+        rhs_parsed, err_rhs = _parse_expression_string(rhs_str, evaluate=False)
         
         if err_lhs: return None, err_lhs
         if err_rhs: return None, err_rhs
@@ -202,7 +338,7 @@ def get_latex_from_expr(expression_string):
             return f"\\text{{{str(lhs_parsed)} = {str(rhs_parsed)}}}", None
 
 
-    parsed_expr, error = _parse_expression_string(expr_for_preview)
+    parsed_expr, error = _parse_expression_string(expr_for_preview, evaluate=False)
     if error:
         # If parsing fails, return the error message for display
         return None, error 
@@ -217,25 +353,76 @@ def get_latex_from_expr(expression_string):
 
 # --- Basic operations (wrap parse + sympy calls) ---
 
+# Per-process memos for the heavy rewrite passes; SymPy expressions are immutable and
+# hash structurally, so a repeated (sub)result reuses the earlier answer
+@lru_cache(maxsize=256)
+def _expand_cached(expr, trig):
+    return expand(expr, trig=trig)
+
+@lru_cache(maxsize=256)
+def _factor_cached(expr):
+    return factor(expr)
+
+@lru_cache(maxsize=256)
+def _simplify_cached(expr):
+    return simplify(expr)
+
+@lru_cache(maxsize=256)
+def _trigsimp_cached(expr):
+    return trigsimp(expr)
+
+@lru_cache(maxsize=256)
+def _apart_cached(expr, var):
+    return apart(expr, var)
+
+@lru_cache(maxsize=256)
+def _logcombine_cached(expr):
+    return logcombine(expr, force=True)
+
 def expand_expr(expression_string):
     parsed_expr, error = _parse_expression_string(expression_string)
     if error:
         return None, None, error
+    # The parser can also hand back plain Python values (True for '1==1', tuples, sets)
+    if isinstance(parsed_expr, Basic) and parsed_expr.is_Atom:
+        # Nothing to expand in a number or a symbol
+        return _format_output(parsed_expr)
     try:
-        # trig=True will also expand trig identities where applicable
-        expanded = expand(parsed_expr, trig=True)
+        # trig=True will also expand trig identities where applicable; it is an
+        # extra rewrite pass over every node, so only ask for it when there are any
+        expanded = _expand_cached(parsed_expr, parsed_expr.has(*_TRIG_EXPANDABLE))
         return _format_output(expanded)
     except Exception as e:
         return None, None, f"❌ Error during expansion: {e}"
 
+def _is_trivially_factored(expr):
+    """True for atoms, f(atom) and monomials: results factor() would hand back unchanged."""
+    if not isinstance(expr, Basic):
+        return False
+    if expr.is_Atom:
+        return True
+    terms = expr.args if expr.is_Mul else (expr,)
+    return all(
+        term.is_Atom
+        or (term.is_Pow and term.base.is_Atom and term.exp.is_Atom)
+        or (term.is_Function and all(arg.is_Atom for arg in term.args))
+        for term in terms
+    )
+
 def simplify_expr(expression_string):
     parsed_expr, error = _parse_expression_string(expression_string)
     if error:
         return None, None, error
+    if isinstance(parsed_expr, Basic) and parsed_expr.is_Atom:
+        # Numbers and symbols are already as simple as they get
+        return _format_output(parsed_expr)
     try:
         # Try algebraic simplify then trigonometric simplification
-        simplified = simplify(parsed_expr)
-        simplified = trigsimp(simplified)
+        simplified = _simplify_cached(parsed_expr)
+        if simplified.has(*_TRIG_HYPERBOLIC_FUNCS):
+            simplified = _trigsimp_cached(simplified)
+        if _is_trivially_factored(simplified):
+            return _format_output(simplified)
         try:
             # Try to factor the simplified result for readability
             result = factor(simplified, trig=True)
@@ -250,13 +437,80 @@ def factor_expr(expression_string):
     parsed_expr, error = _parse_expression_string(expression_string)
     if error:
         return None, None, error
+    # The parser can also hand back plain Python values (True for '1==1', tuples, sets)
+    terms = parsed_expr.args if isinstance(parsed_expr, Basic) and parsed_expr.is_Mul else (parsed_expr,)
+    if all(
+        isinstance(term, Basic)
+        and (term.is_Atom or (term.is_Pow and term.base.is_Atom and term.exp.is_Atom))
+        for term in terms
+    ):
+        # Atoms and monomials come back from factor() unchanged (unlike f(atom): log(4) -> 2*log(2))
+        return _format_output(parsed_expr)
     try:
         # factor(..., trig=True) attempts trig-factorization as well
-        factored = factor(parsed_expr)
+        factored = _factor_cached(parsed_expr)
         return _format_output(factored)
     except Exception as e:
         return None, None, f"❌ Error during factorization: {e}. Not all expressions can be factored."
 
+@lru_cache(maxsize=256)
+def _compile_numeric(sympy_expr, variables):
+    """Compiles sympy_expr into a numeric function of variables (JIT-ed when numba is available)."""
+    if njit is not None:
+        try:
+            return njit(lambdify(variables, sympy_expr, modules='numpy', cse=True))
+        except Exception:
+            pass
+    return lambdify(variables, sympy_expr, modules='math', cse=True)
+
+def _fast_numeric(sympy_expr, substitutions):
+    """
+    Evaluates sympy_expr with a compiled numeric function when every free symbol
+    is substituted by a Float. Returns a SymPy Float, or None if the fast path
+    does not apply and the caller should fall back to SymPy.
+    Exact inputs (integers, rationals, pi, ...) always take the SymPy path: machine
+    floats would turn sin(pi) into 1.2e-16 and lose exact cancellations.
+    """
+    if not all(isinstance(v, Float) for v in substitutions.values()):
+        return None
+    if sympy_expr.has(NumberSymbol, ImaginaryUnit) or not sympy_expr.free_symbols <= substitutions.keys():
+        return None
+    try:
+        values = [float(v) for v in substitutions.values()]
+        fn = _compile_numeric(sympy_expr, tuple(substitutions))
+        result = float(fn(*values))
+    except Exception:
+        # Complex results, domain errors, numba typing errors, unknown functions...
+        return None
+    if not math.isfinite(result) or result == 0:
+        # nan/inf (numpy's answer to sqrt(-1), log(0)) and zero are left to SymPy,
+        # which gives I/zoo and prints an exact zero the way the slow path does
+        return None
+    return Float(result)
+
+def _fast_sympify(s, evaluate=True):
+    """sympify() with the parser's locals; plain integer/decimal literals skip the parser entirely."""
+    s = s.strip()
+    if _NUMBER_LITERAL_RE.fullmatch(s):
+        return Integer(s) if _INTEGER_LITERAL_RE.fullmatch(s) else Float(s)
+    # A copy: sympify evals with locals as the namespace, so '(pi:=5)' would rebind pi
+    return sympify(s, locals=dict(_ALLOWED_LOCALS), evaluate=evaluate)
+
+def _split_assignments(var_assignments_str):
+    """
+    Splits "x=2, y=3" into [('x', '2'), ('y', '3')], skipping empty entries.
+    Returns (pairs, None) or (None, error_message).
+    """
+    pairs = []
+    for assignment in var_assignments_str.split(','):
+        var_name, sep, val_str = assignment.partition('=')
+        if not sep:
+            if assignment.strip():
+                return None, f"❌ Error: Invalid format: '{assignment.strip()}'. Expected 'var=value'."
+            continue
+        pairs.append((var_name.strip(), val_str.strip()))
+    return pairs, None
+
 def substitute_expr(full_input_string):
     parts = full_input_string.split(';', 1)
     expression_string = parts[0].strip()
@@ -265,41 +519,36 @@ def substitute_expr(full_input_string):
 
     # Use a clean sympify for the expression to avoid issues with complex parsers
     try:
-        parsed_expr = sympify(expression_string, evaluate=False)
+        parsed_expr = _fast_sympify(expression_string, evaluate=False)
     except Exception as e:
         return None, None, f"❌ Error parsing expression: {e}"
 
-    substitutions = {}
     if len(parts) > 1 and parts[1].strip():
-        var_assignments_str = parts[1].strip()
+        assignments, error = _split_assignments(parts[1])
+        if error:
+            return None, None, error
         try:
-            assignments = var_assignments_str.split(',')
-            for assignment in assignments:
-                assignment = assignment.strip()
-                if not assignment:
-                    continue
-                var_val = assignment.split('=', 1)
-                if len(var_val) != 2:
-                    return None, None, f"❌ Error: Invalid format: '{assignment}'. Expected 'var=value'."
-                
-                var_name = var_val[0].strip()
-                val_str = var_val[1].strip()
-                
-                # Create symbol and value safely
-                var_symbol = symbols(var_name)
-                val_object = sympify(val_str)
-                substitutions[var_symbol] = val_object
-
+            # Create symbols and values safely
+            substitutions = {symbols(var_name): _fast_sympify(val_str) for var_name, val_str in assignments}
         except Exception as e_parse_subs:
             return None, None, f"❌ Error parsing variable assignments: {e_parse_subs}"
     else:
         return None, None, "❌ Error: No substitution values provided."
 
     try:
-        substituted_expr = parsed_expr.subs(substitutions)
+        fast_result = _fast_numeric(parsed_expr, substitutions)
+        if fast_result is not None:
+            return str(fast_result), sympy_latex(fast_result), None
+
+        if all(isinstance(var, Symbol) for var in substitutions):
+            # Plain symbol keys: literal node replacement, no subs() pattern matching
+            substituted_expr = parsed_expr.xreplace(substitutions)
+        else:
+            substituted_expr = parsed_expr.subs(substitutions)
         
         # If all variables are substituted, evaluate to a number
-        if not substituted_expr.free_symbols:
+        # (has() stops at the first Symbol instead of collecting all of them)
+        if not substituted_expr.has(Symbol):
             evaluated_result = substituted_expr.evalf()
             return str(evaluated_result), sympy_latex(evaluated_result), None
         else:
@@ -307,6 +556,13 @@ def substitute_expr(full_input_string):
     except Exception as e:
         return None, None, f"❌ Error during substitution: {e}"
 
+_X = Symbol('x')
+
+@lru_cache(maxsize=256)
+def _sym(name):
+    """Symbol(name) for a user-supplied variable name, memoized for repeat requests."""
+    return Symbol(name)
+
 def _general_chain_rule_diff(eq_lhs, eq_rhs, w_r_t_var):
     """
     Applies the differential operator d/dt to both sides of an equation, 
@@ -320,12 +576,14 @@ def _general_chain_rule_diff(eq_lhs, eq_rhs, w_r_t_var):
     known_constants = {pi, E, sympify('I')}
     symbols_to_make_functions = all_symbols - {t} - known_constants
     
-    # 2. Map every symbol to a function of 't'
+    # 2. Map every symbol to a function of 't' (and back, for the final output)
     func_map = {sym: Function(str(sym))(t) for sym in symbols_to_make_functions}
+    inv_func_map = {v: k for k, v in func_map.items()}
         
     # 3. Substitute and Differentiate both sides w.r.t. t
-    LHS_func = eq_lhs.subs(func_map)
-    RHS_func = eq_rhs.subs(func_map)
+    # xreplace: the keys are plain Symbols, so no pattern matching is needed
+    LHS_func = eq_lhs.xreplace(func_map)
+    RHS_func = eq_rhs.xreplace(func_map)
     
     LHS_diff = sympy_diff(LHS_func, t)
     RHS_diff = sympy_diff(RHS_func, t)
@@ -338,12 +596,12 @@ def _general_chain_rule_diff(eq_lhs, eq_rhs, w_r_t_var):
     display_replace_map = {}
     # For LaTeX string (e.g., "\frac{dx}{dt}")
     latex_replace_map = {}
+    t_name = str(t)
 
-    for sym in symbols_to_make_functions:
+    for sym, func in func_map.items():
         # The SymPy object for the derivative, e.g., Derivative(x(t), t)
-        derivative_obj = Derivative(func_map[sym], t)
+        derivative_obj = Derivative(func, t)
         sym_name = str(sym)
-        t_name = str(t)
         
         # Mapping for the simple string display
         display_replace_map[derivative_obj] = Symbol(f"d{sym_name}/d{t_name}")
@@ -353,11 +611,13 @@ def _general_chain_rule_diff(eq_lhs, eq_rhs, w_r_t_var):
         latex_replace_map[derivative_obj] = latex_derivative_symbol
     
     # 5. Apply the replacements to the differentiated expressions
-    LHS_display = LHS_diff.subs(display_replace_map).subs({v: k for k, v in func_map.items()})
-    RHS_display = RHS_diff.subs(display_replace_map).subs({v: k for k, v in func_map.items()})
+    # The keys are the exact Derivative/function nodes produced above, so a
+    # structural xreplace is enough
+    LHS_display = LHS_diff.xreplace(display_replace_map).xreplace(inv_func_map)
+    RHS_display = RHS_diff.xreplace(display_replace_map).xreplace(inv_func_map)
     
-    LHS_latex = LHS_diff.subs(latex_replace_map).subs({v: k for k, v in func_map.items()})
-    RHS_latex = RHS_diff.subs(latex_replace_map).subs({v: k for k, v in func_map.items()})
+    LHS_latex = LHS_diff.xreplace(latex_replace_map).xreplace(inv_func_map)
+    RHS_latex = RHS_diff.xreplace(latex_replace_map).xreplace(inv_func_map)
 
     # 6. Generate final strings
     final_display_str = f"{LHS_display} = {RHS_display}"
@@ -375,6 +635,9 @@ def differentiate_expr(full_input_string):
     Explicit Input: expr or expr; var, order (e.g., x^3; x, 2)
     Implicit Input: equation=expr; dependent_var, independent_var (e.g., x^2+y^2=1; y, x)
     Total Derivative: equation=expr; diff_wrt_var (e.g., -1/x=m; y)
+    Explicit derivatives get a cheap tidy-up instead of a full simplify(): trigsimp()
+    for trig and hyperbolic results, factor() for rational functions (so d/dx
+    (x^2-1)/(x-1) is 1), and together() plus factor_terms() for everything else.
     """
     parts = full_input_string.split(';', 1)
     expr_or_equation_string = parts[0].strip()
@@ -409,7 +672,7 @@ def differentiate_expr(full_input_string):
                 # Case 1: Total Differentiation (e.g., -1/x=m; y)
                 # --------------------------------------------------------
                 try:
-                    diff_wrt_var = Symbol(var_parts_split[0])
+                    diff_wrt_var = _sym(var_parts_split[0])
                 except Exception as e:
                     return None, None, f"❌ Error: Invalid variable '{var_parts_split[0]}'"
 
@@ -423,8 +686,8 @@ def differentiate_expr(full_input_string):
                 independent_var_name = var_parts_split[1]
                 
                 try:
-                    dependent = Symbol(dependent_var_name)
-                    independent = Symbol(independent_var_name)
+                    dependent = _sym(dependent_var_name)
+                    independent = _sym(independent_var_name)
                 except Exception as e:
                     return None, None, f"❌ Error: Invalid variable names: {e}"
 
@@ -453,7 +716,7 @@ def differentiate_expr(full_input_string):
         if error:
             return None, None, error
 
-        var = Symbol('x') # Default variable is 'x'
+        var = _X # Default variable is 'x'
         order = 1         # Default order is 1 (first derivative)
 
         if len(parts) > 1 and parts[1].strip():
@@ -462,7 +725,7 @@ def differentiate_expr(full_input_string):
             
             var_name = var_parts_split[0]
             try:
-                var = Symbol(var_name)
+                var = _sym(var_name)
             except Exception as e:
                 return None, None, f"❌ Error: Invalid variable name '{var_name}'"
                 
@@ -477,8 +740,19 @@ def differentiate_expr(full_input_string):
         try:
             # SymPy diff signature: diff(expr, var, order)
             differentiated = sympy_diff(parsed_expr, var, order)
-            simplified_result = simplify(differentiated)
-            return _format_output(simplified_result)
+            # Cheap, targeted tidy-ups instead of the full simplify() search
+            if differentiated.has(*_TRIG_HYPERBOLIC_FUNCS):
+                result = trigsimp(differentiated)
+            elif differentiated.is_polynomial():
+                result = differentiated
+            elif differentiated.is_rational_function():
+                # Quotient-rule output: one fraction with cancelled, factored terms
+                result = factor(differentiated)
+            else:
+                # Product/quotient-rule sums over exp, log, roots: one fraction with the
+                # common factor pulled out, e.g. x*exp(x) + exp(x) -> (x + 1)*exp(x)
+                result = factor_terms(together(differentiated))
+            return _format_output(result)
         except Exception as e:
             return None, None, f"❌ Error during differentiation: {e}"
 
@@ -546,48 +820,184 @@ def mellin_transform_expr(s):
     return _format_output(mellin_transform(p, t, k, noconds=True))
 
 # --- Worker/timeout helper for heavy CAS operations ---
-def _worker_wrapper(fn, q, *args, **kwargs):
-    """Run fn(*args, **kwargs) and put (result, latex, error) in queue."""
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+_worker_pool_disabled = False
+
+def _warm_worker():
+    """Pool initializer: make sure SymPy is imported before the first task arrives."""
+    import sympy  # noqa: F401
+
+def _get_worker_pool():
+    """Returns the worker pool, or None where worker processes cannot be started."""
+    global _worker_pool, _worker_pool_disabled
+    with _worker_pool_lock:
+        if _worker_pool is None and not _worker_pool_disabled:
+            try:
+                _worker_pool = ProcessPoolExecutor(
+                    max_workers=max(2, (os.cpu_count() or 2) // 2), initializer=_warm_worker
+                )
+            except (OSError, NotImplementedError, ImportError):
+                # No working multiprocessing here (e.g. serverless runtimes without /dev/shm)
+                _worker_pool_disabled = True
+        return _worker_pool
+
+def _disable_worker_pool(pool):
+    """Falls back to running solvers inline after pool failed to start its workers."""
+    global _worker_pool, _worker_pool_disabled
+    with _worker_pool_lock:
+        _worker_pool_disabled = True
+        if _worker_pool is pool:
+            _worker_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _reset_worker_pool(pool):
+    """
+    Kills pool's workers if it is still the current pool; the next call starts a
+    fresh one. An already-replaced pool is left alone, so a late failure from it
+    cannot take down the pool other calls are using.
+    """
+    global _worker_pool
+    with _worker_pool_lock:
+        if _worker_pool is not pool:
+            return
+        _worker_pool = None
+    # _processes is None once the pool has been shut down
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# Set MATH_DEBUG to get full tracebacks in solver error messages
+_DEBUG_TRACEBACK = bool(os.environ.get('MATH_DEBUG'))
+
+def _worker_wrapper(fn, *args, **kwargs):
+    """Run fn(*args, **kwargs) and return (result, latex, error)."""
     try:
         res = fn(*args, **kwargs)
         # Check if the result is already a (display, latex, error) tuple 
-        if isinstance(res, tuple) and len(res) == 3 and res[2] is not None:
-            # If it's an error tuple, pass it through
-            q.put(res)
-        elif isinstance(res, tuple) and len(res) == 3:
-             # If it's a display, latex, None tuple (from the new functions), pass it
-             q.put(res)
-        else:
-            # single returned expression -> produce display and latex
-            display, latex, err = _format_output(res)
-            q.put((display, latex, err))
+        if isinstance(res, tuple) and len(res) == 3:
+            # Error tuples and (display, latex, None) tuples are passed through
+            return res
+        # single returned expression -> produce display and latex
+        return _format_output(res)
     except Exception as e:
-        q.put((None, None, f"{e}\n{traceback.format_exc()}"))
+        if not _DEBUG_TRACEBACK:
+            return None, None, f"{type(e).__name__}: {e}"
+        import traceback  # only needed on this error path
+        return None, None, f"{e}\n{traceback.format_exc()}"
+
+# Results above this size are zlib-compressed before crossing the pool's pipe
+_IPC_COMPRESS_THRESHOLD = 64 * 1024
+
+def pack_result(result):
+    """Compresses the very large output strings of a result tuple before it is pickled back from a worker."""
+    return tuple(
+        ('z', zlib.compress(part.encode('utf-8'), 1))
+        if isinstance(part, str) and len(part) > _IPC_COMPRESS_THRESHOLD else part
+        for part in result
+    )
+
+def unpack_result(result):
+    """Inverse of pack_result()."""
+    return tuple(
+        zlib.decompress(part[1]).decode('utf-8') if isinstance(part, tuple) else part
+        for part in result
+    )
+
+def run_packed(fn, *args, **kwargs):
+    """Pool task for a solver running in another process: fn's result through pack_result()."""
+    return pack_result(fn(*args, **kwargs))
+
+def _pool_worker_task(fn, *args, **kwargs):
+    """_worker_wrapper for the pool, with its result through pack_result()."""
+    return pack_result(_worker_wrapper(fn, *args, **kwargs))
+
+class _SolverTimeout(BaseException):
+    """Raised by the SIGALRM handler; a BaseException so SymPy's `except Exception` blocks let it through."""
+
+def _raise_solver_timeout(signum, frame):
+    raise _SolverTimeout()
+
+def _can_use_alarm():
+    """SIGALRM timeouts need POSIX, the main thread and no interval timer already armed."""
+    return (
+        hasattr(signal, 'SIGALRM')
+        and threading.current_thread() is threading.main_thread()
+        and signal.getitimer(signal.ITIMER_REAL)[0] == 0
+    )
+
+def _run_inprocess_with_timeout(fn, args, kwargs, timeout):
+    """Run fn in this process, interrupting it with SIGALRM after timeout seconds."""
+    old_handler = signal.signal(signal.SIGALRM, _raise_solver_timeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return _worker_wrapper(fn, *args, **kwargs)
+    except _SolverTimeout:
+        return None, None, f"❌ Error: Operation timed out after {timeout} seconds."
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, old_handler)
 
 def _run_with_timeout(fn, args=(), kwargs=None, timeout=5):
     """
-    Run fn in separate process with timeout (seconds).
+    Run fn with timeout (seconds): in-process under SIGALRM where possible,
+    otherwise in a persistent worker pool (or inline, untimed, where no pool can start).
     Returns (display, latex, error) where one of display/latex is filled on success.
     """
     if kwargs is None:
         kwargs = {}
-    q = Queue()
-    p = Process(target=_worker_wrapper, args=(fn, q) + args, kwargs=kwargs)
-    p.start()
-    p.join(timeout)
-    if p.is_alive():
-        p.terminate()
-        p.join()
-        return None, None, f"❌ Error: Operation timed out after {timeout} seconds."
+    if _can_use_alarm():
+        return _run_inprocess_with_timeout(fn, args, kwargs, timeout)
+    if multiprocessing.parent_process() is not None:
+        # Already inside a worker process (e.g. the web app's solver pool), whose
+        # owner enforces its own timeout; a nested pool per worker would only add overhead
+        return _worker_wrapper(fn, *args, **kwargs)
+
+    pool = _get_worker_pool()
+    if pool is None:
+        return _worker_wrapper(fn, *args, **kwargs)
     try:
-        if q.empty():
-            return None, None, "❌ Error: Worker did not return a result."
-        display, latex, err = q.get_nowait()
-        return display, latex, err
+        # submit() itself raises BrokenProcessPool once a worker has died
+        future = pool.submit(_pool_worker_task, fn, *args, **kwargs)
+        return unpack_result(future.result(timeout=timeout))
+    except FutureTimeoutError:
+        # A running SymPy call cannot be interrupted, only its process killed
+        if not future.cancel():
+            _reset_worker_pool(pool)
+        return None, None, f"❌ Error: Operation timed out after {timeout} seconds."
+    except BrokenProcessPool:
+        _reset_worker_pool(pool)
+        return None, None, "❌ Error: Worker did not return a result."
+    except OSError:
+        # submit() could not start the worker processes; run without a timeout
+        _disable_worker_pool(pool)
+        return _worker_wrapper(fn, *args, **kwargs)
     except Exception as e:
         return None, None, f"❌ Error retrieving worker result: {e}"
 
 # --- Integration support ---
+# The most common symbolic limits, looked up without invoking the parser
+_LIMIT_CONSTANTS = {
+    'inf': S.Infinity, 'oo': S.Infinity, '-inf': S.NegativeInfinity, '-oo': S.NegativeInfinity,
+    'pi': pi, '-pi': -pi, 'E': E, '-E': -E,
+}
+
+@lru_cache(maxsize=256)
+def _parse_limit(s):
+    """
+    Parses one integration limit, memoized; common constants skip the parser entirely.
+    Limits use plain sympify (no implicit multiplication), so '1e3' stays a number
+    and 'y z' stays an error.
+    Returns (limit, None) or (None, error_message).
+    """
+    s = s.strip()
+    if s in _LIMIT_CONSTANTS:
+        return _LIMIT_CONSTANTS[s], None
+    try:
+        return _fast_sympify(s), None
+    except Exception as e:
+        return None, f"❌ Error parsing limits: {e}"
+
 def _parse_integration_request(full_input_string):
     """
     Parses integration requests: "expr", "expr ; x", or "expr ; x=a,b".
@@ -610,10 +1020,12 @@ def _parse_integration_request(full_input_string):
                 varname, bounds = varpart.split('=', 1)
                 varname = varname.strip()
                 a_str, b_str = bounds.split(',', 1)
-                # Define locals to correctly parse 'inf' and 'oo'
-                inf_locals = {'inf': S.Infinity, 'oo': S.Infinity}
-                a = sympify(a_str.strip(), locals=inf_locals)
-                b = sympify(b_str.strip(), locals=inf_locals)
+                a, err = _parse_limit(a_str)
+                if err:
+                    return None, None, None, err
+                b, err = _parse_limit(b_str)
+                if err:
+                    return None, None, None, err
                 var = symbols(varname)
                 limits = (var, a, b)
             except Exception as e:
@@ -629,40 +1041,75 @@ def _parse_integration_request(full_input_string):
 
     return parsed_expr, var, limits, None
 
-def _manualintegrate_worker(parsed_expr, var, limits):
-    """
-    Worker target to perform integration.
-    Includes partial fraction decomposition for rational functions and relies on
-    sympy.integrate for complex techniques like trigonometric substitution.
-    Returns SymPy expression (antiderivative for indefinite or value for definite).
-    """
-    # Check if the expression is a rational function of the integration variable
-    # If the expression is a rational function of the variable, perform partial fraction decomposition
-    if parsed_expr.is_rational_function(var):
-        try:
-            # Apply partial fraction decomposition using `apart`
-            parsed_expr = apart(parsed_expr, var)
-        except Exception:
-            # If apart fails (e.g., SymPy issues), continue with original expression
-            pass
-            
-    # --- OPTIMIZATION FOR COMPLEX INTEGRALS LIKE sin(2x) * exp(...) ---
+def _integrate_general(expr, var, limits):
+    """Use the powerful sympy_integrate directly to handle all complex cases."""
+    if limits is None:
+        # Indefinite integral (handles trigonometric substitution, u-sub, etc.)
+        return sympy_integrate(expr, var)
+    # Definite integral
+    return sympy_integrate(expr, limits)
+
+def _integrate_polynomial(expr, var, limits):
+    """Closed form for polynomials in var: no need for the general integrator."""
+    antiderivative = Poly(expr, var).integrate().as_expr()
+    if limits is None:
+        return antiderivative
+    _, a, b = limits
+    return antiderivative.subs(var, b) - antiderivative.subs(var, a)
+
+def _integrate_rational(expr, var, limits):
+    """Partial fraction decomposition first, so each term integrates on its own."""
+    try:
+        # Apply partial fraction decomposition using `apart`
+        expr = _apart_cached(expr, var)
+    except Exception:
+        # If apart fails (e.g., SymPy issues), continue with original expression
+        pass
+    return _integrate_general(expr, var, limits)
+
+def _integrate_trig(expr, var, limits):
+    """Trig identities first; optimization for complex integrals like sin(2x) * exp(...)."""
     try:
         # 1. Use trigsimp to handle basic trig identities
-        simplified_expr = trigsimp(parsed_expr)
+        simplified_expr = _trigsimp_cached(expr)
         # 2. Use factor with trig=True to expand sin(2x) etc., which is key for u-sub
-        parsed_expr = factor(simplified_expr, trig=True)
+        expr = factor(simplified_expr, trig=True)
     except Exception:
         # Ignore simplification failure and proceed with the original expression.
         pass
+    return _integrate_general(expr, var, limits)
+
+def _is_plain_polynomial(expr, var, limits):
+    """Polynomial in var with exact coefficients and no infinite or nan limits."""
+    # Poly turns Float coefficients into 1.0*y-style terms, and oo - oo would give nan.
+    # Symbolic bounds have is_finite None and are fine; nan does too, so it is checked separately.
+    if not expr.is_polynomial(var) or expr.has(Float):
+        return False
+    return limits is None or all(
+        bound.is_finite is not False and bound is not S.NaN for bound in limits[1:]
+    )
 
-    # Use the powerful sympy_integrate directly to handle all complex cases
-    if limits is None:
-        # Indefinite integral (handles trigonometric substitution, u-sub, etc.)
-        return sympy_integrate(parsed_expr, var)
-    else:
-        # Definite integral
-        return sympy_integrate(parsed_expr, limits)
+# (predicate, handler) pairs, most specific first; the last entry always matches
+_INTEGRATION_STRATEGIES = [
+    (_is_plain_polynomial, _integrate_polynomial),
+    (lambda expr, var, limits: expr.is_rational_function(var) and not expr.is_polynomial(var), _integrate_rational),
+    (lambda expr, var, limits: expr.has(*_TRIG_FUNCS), _integrate_trig),
+    (lambda expr, var, limits: True, _integrate_general),
+]
+
+@lru_cache(maxsize=256)
+def _manualintegrate_worker(parsed_expr, var, limits):
+    """
+    Worker target to perform integration.
+    Dispatches on the integrand's structure: closed form for polynomials, partial
+    fraction decomposition for rational functions, trig identities for trig integrands,
+    and sympy.integrate for everything else (trigonometric substitution, u-sub, ...).
+    Returns SymPy expression (antiderivative for indefinite or value for definite).
+    Memoized per worker process, so a repeated integral skips the integrator entirely.
+    """
+    for matches, integrate_with in _INTEGRATION_STRATEGIES:
+        if matches(parsed_expr, var, limits):
+            return integrate_with(parsed_expr, var, limits)
 
 def integrate_expr(full_input_string, timeout_seconds=20):
     """
@@ -701,31 +1148,49 @@ def resimplify_expr(expression_string):
     # strip trailing '+ C' (common for indefinite integrals) to avoid parse problems
     expr_str = expression_string.strip()
     # remove trailing + C or +C (case-insensitive, with optional spaces)
-    expr_str = re.sub(r'\s*\+\s*C\s*$', '', expr_str, flags=re.IGNORECASE)
+    expr_str = _TRAILING_C_RE.sub('', expr_str)
 
     parsed_expr, error = _parse_expression_string(expr_str)
     if error:
         return None, None, error
+    if isinstance(parsed_expr, Basic) and parsed_expr.is_Atom:
+        return _format_output(parsed_expr)
     try:
-        s = simplify(parsed_expr)     # algebraic simplify
-        s = trigsimp(s)               # trig simplification
+        s = _simplify_cached(parsed_expr)  # algebraic simplify
+        if s.has(*_TRIG_HYPERBOLIC_FUNCS):
+            s = _trigsimp_cached(s)        # trig simplification
 
         # attempt to combine logs
-        try:
-            from sympy import logcombine
-            # logcombine can sometimes raise for certain forms; guard it
-            s = logcombine(s, force=True)
-        except Exception:
-            # ignore logcombine errors and continue with what we have
-            pass
+        if s.has(log):
+            try:
+                # logcombine can sometimes raise for certain forms; guard it
+                s = _logcombine_cached(s)
+            except Exception:
+                # ignore logcombine errors and continue with what we have
+                pass
 
         # final tidy: factor trig-aware if it helps readability
-        try:
-            s = factor(s, trig=True)
-        except Exception:
-            pass
+        if not _is_trivially_factored(s):
+            try:
+                s = factor(s, trig=True)
+            except Exception:
+                pass
 
         # convert to nicer display (unicode superscripts etc.)
         return _format_output(s)
     except Exception as e:
-        return None, None, f"❌ Error during re-simplification: {e}"
\ No newline at end of file
+        return None, None, f"❌ Error during re-simplification: {e}"
+
+# --- Mode dispatch table: maps an API mode name to its solver ---
+DISPATCH = {
+    'expand': expand_expr,
+    'simplify': simplify_expr,
+    'factor': factor_expr,
+    'substitute': substitute_expr,
+    'integrate': integrate_expr,
+    'differentiate': differentiate_expr,
+    'resimplify': resimplify_expr,
+    'laplace_t': laplace_transform_expr,
+    'fourier_t': fourier_transform_expr,
+    'mellin_t': mellin_transform_expr,
+}
@@ -0,0 +1,100 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import Abs, E, Symbol, oo, pi
+
+import solver_utils
+
+x = Symbol('x')
+
+
+class AbsPreprocessingTest(unittest.TestCase):
+    """Unary minus and numeric coefficients in front of abs() after the FIX 1 pass was removed."""
+
+    def test_preprocess(self):
+        self.assertEqual(solver_utils._preprocess('-abs(x)'), '-Abs(x)')
+        self.assertEqual(solver_utils._preprocess('2abs(x)'), '2*Abs(x)')
+        self.assertEqual(solver_utils._preprocess('(-abs(x))'), '(-1*Abs(x))')
+
+    def test_parse(self):
+        for evaluate in (True, False):
+            with self.subTest(evaluate=evaluate):
+                self.assertEqual(solver_utils._parse_expression_string('-abs(x)', evaluate), (-Abs(x), None))
+                self.assertEqual(solver_utils._parse_expression_string('2abs(x)', evaluate), (2 * Abs(x), None))
+                self.assertEqual(solver_utils._parse_expression_string('x-abs(x)', evaluate), (x - Abs(x), None))
+
+
+class ParserNamespaceTest(unittest.TestCase):
+    """Assignment expressions must not leak into the parser namespaces shared by later parses."""
+
+    def test_walrus_does_not_rebind_names(self):
+        solver_utils._parse_expression_string('(pi:=5)')
+        solver_utils._parse_expression_string('(Integer:=Float)')
+        self.assertEqual(solver_utils._parse_expression_string('2*pi + 1'), (2 * pi + 1, None))
+        self.assertEqual(solver_utils.expand_expr('x/2 + 3')[0], 'x/2 + 3')
+
+    def test_walrus_in_substitution_and_limits(self):
+        solver_utils.substitute_expr('(pi:=5) + x; x=1')
+        solver_utils.substitute_expr('x; x=(E:=2)')
+        solver_utils._parse_limit('(oo:=3)')
+        self.assertEqual(solver_utils._fast_sympify('pi + E + oo'), pi + E + oo)
+
+
+class NonExpressionInputTest(unittest.TestCase):
+    """Comparisons, tuples and sets parse to plain Python values; solvers must not raise on them."""
+
+    def test_solvers_return_result_tuples(self):
+        solvers = (
+            solver_utils.expand_expr,
+            solver_utils.factor_expr,
+            solver_utils.simplify_expr,
+            solver_utils.resimplify_expr,
+        )
+        for solver in solvers:
+            for text in ('x==1', '1==1', '(1,2)', '{x}', '[x]'):
+                with self.subTest(solver=solver.__name__, text=text):
+                    result = solver(text)
+                    self.assertIsInstance(result, tuple)
+                    self.assertEqual(len(result), 3)
+
+    def test_is_trivially_factored(self):
+        self.assertFalse(solver_utils._is_trivially_factored(False))
+        self.assertFalse(solver_utils._is_trivially_factored((1, 2)))
+        self.assertTrue(solver_utils._is_trivially_factored(x))
+
+
+class PolynomialIntegrationTest(unittest.TestCase):
+    """The closed-form polynomial path must leave nan limits to sympy.integrate."""
+
+    def test_nan_limits_are_rejected(self):
+        for text in ('x; x=0,nan', 'x; x=nan,1', 'x^2; x=0,zoo'):
+            with self.subTest(text=text):
+                display, latex, error = solver_utils.integrate_expr(text)
+                self.assertIsNone(display)
+                self.assertTrue(error)
+
+    def test_symbolic_limits(self):
+        self.assertEqual(solver_utils.integrate_expr('x; x=0,a')[0], 'a²/2')
+
+
+class DifferentiationTidyUpTest(unittest.TestCase):
+    """Explicit derivatives are combined and factored without a full simplify()."""
+
+    def test_results(self):
+        cases = {
+            'x*exp(x)': '(x + 1)exp(x)',
+            'exp(2x)/(1+exp(2x))': '2exp(2x)/(exp(2x) + 1)²',
+            'sinh(x)^2': 'sinh(2x)',
+            '(x^2-1)/(x-1)': '1',
+            'x^3; x, 2': '6x',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(solver_utils.differentiate_expr(text)[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main()